@@ -3,8 +3,10 @@ __version__ = "0.1.1"
 from .core import (
     execute_remote_code,
     search_repository,
+    search_owner,
     get_folder_contents,
     download_file,
     download_folder,
     install_tool
-)
\ No newline at end of file
+)
+from .executor import ExecutionPool, ExecutionResult
\ No newline at end of file
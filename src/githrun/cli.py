@@ -10,6 +10,7 @@ from . import __version__
 
 from .core import (
     execute_remote_code, 
+    watch_remote_code,
     search_repository, 
     get_folder_contents, 
     download_file, 
@@ -19,7 +20,7 @@ from .core import (
     add_bookmark,
     list_bookmarks
 )
-from .network import RateLimitError, fetch_url_content, fetch_gist_content, convert_to_raw_url
+from .network import RateLimitError, fetch_url_content, fetch_gist_content, resolve_raw_url
 from .utils import print_error, print_info, print_warning, print_success, ConfigManager
 
 app = typer.Typer(help="Githrun: Run Python code from GitHub instantly.")
@@ -28,6 +29,14 @@ app.add_typer(bookmark_app, name="bookmark")
 
 console = Console()
 
+def format_size(num_bytes: int) -> str:
+    size = float(num_bytes or 0)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
 # --- VERSION HANDLING ---
 
 def version_callback(value: bool):
@@ -80,7 +89,9 @@ def run(
     url: str = typer.Argument(..., help="GitHub URL, Gist URL, or Bookmark Name."),
     inspect: bool = typer.Option(False, "--inspect", "-i", help="Print code without running."),
     yes: bool = typer.Option(False, "--yes", "-y", help="Skip confirmation."),
-    auto_install: bool = typer.Option(False, "--auto-install", help="Auto-install missing dependencies.")
+    auto_install: bool = typer.Option(False, "--auto-install", help="Auto-install missing dependencies."),
+    watch: bool = typer.Option(False, "--watch", "-w", help="Re-run the script whenever the remote file changes."),
+    interval: float = typer.Option(5.0, "--interval", min=1, help="Seconds between change checks in --watch mode.")
 ):
     """Download and execute a remote Python script."""
     try:
@@ -91,7 +102,7 @@ def run(
             url = b_url
 
         if inspect:
-            raw = convert_to_raw_url(url)
+            raw = resolve_raw_url(url)
             if raw.startswith("gist:"):
                 content = fetch_gist_content(raw.split(":")[1])
             else:
@@ -106,6 +117,14 @@ def run(
             if not typer.confirm("Execute this script?"):
                 raise typer.Exit()
 
+        if watch:
+            print_info(f"Watching for changes every {interval:g}s. Press Ctrl+C to stop.")
+            try:
+                watch_remote_code(url, auto_install=auto_install, interval=interval)
+            except KeyboardInterrupt:
+                print_info("Stopped watching.")
+            return
+
         execute_remote_code(url, auto_install=auto_install)
 
     except RateLimitError:
@@ -145,27 +164,57 @@ def bookmark_list():
 
 @app.command()
 def find(
-    repo_url: str = typer.Argument(..., help="GitHub repository URL."),
-    query: str = typer.Argument(..., help="Search query (filename)."),
+    repo_url: str = typer.Argument(..., help="GitHub repository URL (or the query when using --org/--user)."),
+    query: Optional[str] = typer.Argument(None, help="Search query (filename)."),
+    glob: bool = typer.Option(False, "--glob", "-g", help="Treat the query as a glob pattern (e.g. '*.py')."),
+    fuzzy: bool = typer.Option(False, "--fuzzy", "-f", help="Rank paths by fuzzy match."),
+    limit: Optional[int] = typer.Option(None, "--limit", "-l", help="Maximum number of results (per repo with --org/--user)."),
+    org: Optional[str] = typer.Option(None, "--org", help="Search every repository of this organization."),
+    user: Optional[str] = typer.Option(None, "--user", help="Search every public repository of this user."),
+    workers: int = typer.Option(8, "--workers", help="Repositories searched in parallel with --org/--user."),
     interactive: bool = typer.Option(True, help="Enable interactive selection.")
 ):
-    """Search for files in a repo."""
+    """Search for files in a repo, or across an organization/user."""
     try:
-        with console.status("Scanning..."):
-            from .core import search_repository
-            results = search_repository(repo_url, query)
+        if glob and fuzzy:
+            print_error("Use either --glob or --fuzzy, not both.")
+            raise typer.Exit(1)
+        if org and user:
+            print_error("Use either --org or --user, not both.")
+            raise typer.Exit(1)
+        mode = "glob" if glob else "fuzzy" if fuzzy else "substring"
+
+        if org or user:
+            if query is not None:
+                print_error("With --org/--user, pass only the query (no repository URL).")
+                raise typer.Exit(1)
+            query = repo_url
+            from .core import search_owner
+            # Stream matches as each repository finishes
+            results = []
+            for r in search_owner(org or user, query, kind="org" if org else "user", mode=mode, limit=limit, workers=workers):
+                results.append(r)
+                console.print(f"[yellow]{len(results)}[/yellow] [green]{r['repo']}[/green] [cyan]{r['path']}[/cyan]")
+        else:
+            if query is None:
+                print_error("Missing search query.")
+                raise typer.Exit(1)
+            with console.status("Scanning..."):
+                from .core import search_repository
+                results = search_repository(repo_url, query, mode=mode, limit=limit)
         
         if not results:
              print_warning("No results.")
              return
 
-        table = Table(title=f"Results for {query}")
-        table.add_column("#", style="yellow")
-        table.add_column("Path", style="cyan")
-        
-        for idx, r in enumerate(results):
-            table.add_row(str(idx+1), r['path'])
-        console.print(table)
+        if not (org or user):
+            table = Table(title=f"Results for {query}")
+            table.add_column("#", style="yellow")
+            table.add_column("Path", style="cyan")
+            
+            for idx, r in enumerate(results):
+                table.add_row(str(idx+1), r['path'])
+            console.print(table)
 
         if interactive:
             choice = Prompt.ask("Select file # to Run (or 'q')")
@@ -177,6 +226,8 @@ def find(
     except RateLimitError:
         print_error("Rate Limit Hit.")
         print_info("Use 'githrun login <token>' to fix this.")
+    except typer.Exit:
+        raise
     except Exception as e:
         print_error(str(e))
 
@@ -211,10 +262,12 @@ def show(url: str = typer.Argument(..., help="GitHub folder URL.")):
         table = Table(title="Contents")
         table.add_column("Name")
         table.add_column("Type")
+        table.add_column("Size", justify="right")
         
         for item in items:
             itype = "Dir" if item['type'] == 'dir' else "File"
-            table.add_row(item['name'], itype)
+            size = "" if item['type'] == 'dir' else format_size(item.get('size', 0))
+            table.add_row(item['name'], itype, size)
         console.print(table)
     except Exception as e:
         print_error(str(e))
@@ -1,25 +1,39 @@
 import sys
+import time
 import subprocess
 import os
 import re
 import platform
 import stat
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
 from .network import (
-    convert_to_raw_url, 
+    resolve_raw_url,
+    resolve_ref,
     fetch_url_content, 
+    fetch_url_conditional,
+    min_poll_interval,
     fetch_gist_content,
     get_repo_details, 
     fetch_tree_recursively, 
-    fetch_folder_contents
+    fetch_folder_contents,
+    fetch_path_index,
+    fetch_files,
+    list_owner_repos,
+    rate_limit_status,
+    RateLimitError
 )
 from .utils import (
     temp_python_file, 
     check_package_installed, 
     ConfigManager, 
     VenvManager, 
-    BIN_DIR
+    BIN_DIR,
+    print_info,
+    print_warning
 )
 
 def resolve_url(url: str) -> str:
@@ -29,20 +43,26 @@ def resolve_url(url: str) -> str:
         return bookmark
     return url
 
-def execute_remote_code(url: str, args: List[str] = None, auto_install: bool = False) -> int:
-    """Downloads and executes a Python script."""
-    
+def fetch_remote_code(url: str, timeout: Optional[float] = None) -> str:
+    """Resolves bookmarks/Gists and downloads the script source. `timeout` applies per request."""
     full_url = resolve_url(url)
-    raw_url = convert_to_raw_url(full_url)
+    raw_url = resolve_raw_url(full_url, timeout)
     
     if raw_url.startswith("gist:"):
-        code_content = fetch_gist_content(raw_url.split(":")[1])
+        code_content = fetch_gist_content(raw_url.split(":")[1], timeout)
     else:
-        code_content = fetch_url_content(raw_url)
+        code_content = fetch_url_content(raw_url, timeout)
 
     if not code_content:
         raise ValueError(f"Could not retrieve content from {full_url}")
+    return code_content
 
+@contextmanager
+def prepared_command(code_content: str, args: List[str] = None, auto_install: bool = False, timeout: Optional[float] = None):
+    """
+    Yields the command line that runs `code_content`, cleaning up the temp files/venv afterwards.
+    `timeout` bounds venv creation plus dependency installation.
+    """
     # Dependency Check
     missing_deps = scan_dependencies(code_content)
     
@@ -50,8 +70,9 @@ def execute_remote_code(url: str, args: List[str] = None, auto_install: bool = F
         # --- VIRTUAL ENV EXECUTION FLOW ---
         manager = VenvManager()
         try:
-            manager.create()
-            manager.install(missing_deps)
+            deadline = time.time() + timeout if timeout is not None else None
+            manager.create(timeout)
+            manager.install(missing_deps, deadline - time.time() if deadline else None)
             
             # Save code to a file inside the temp dir (so it's near the venv)
             script_path = manager.venv_dir / "remote_script.py"
@@ -61,9 +82,7 @@ def execute_remote_code(url: str, args: List[str] = None, auto_install: bool = F
             cmd = [str(manager.python_exe), str(script_path)]
             if args:
                 cmd.extend(args)
-            
-            result = subprocess.run(cmd, capture_output=False)
-            return result.returncode
+            yield cmd
         finally:
             manager.cleanup()
     else:
@@ -75,13 +94,64 @@ def execute_remote_code(url: str, args: List[str] = None, auto_install: bool = F
             cmd = [sys.executable, temp_file]
             if args:
                 cmd.extend(args)
-            result = subprocess.run(cmd, capture_output=False)
-            return result.returncode
+            yield cmd
+
+def execute_remote_code(url: str, args: List[str] = None, auto_install: bool = False) -> int:
+    """Downloads and executes a Python script."""
+    code_content = fetch_remote_code(url)
+    with prepared_command(code_content, args, auto_install) as cmd:
+        result = subprocess.run(cmd, capture_output=False)
+        return result.returncode
+
+def watch_remote_code(url: str, args: List[str] = None, auto_install: bool = False, interval: float = 5.0):
+    """
+    Runs a script and runs it again whenever the remote file changes,
+    restarting it if it is still running. Polls every `interval` seconds
+    with conditional requests (at least once a second); runs until interrupted.
+    """
+    full_url = resolve_url(url)
+    interval = max(interval, 1.0)
+    if interval < min_poll_interval(full_url):
+        interval = min_poll_interval(full_url)
+        print_warning(f"Polling every {interval:g}s to stay within the anonymous API rate limit. Use 'githrun login' to poll faster.")
+
+    code_content, etag = fetch_url_conditional(full_url)
+    if not code_content:
+        raise ValueError(f"Could not retrieve content from {full_url}")
+
+    while True:
+        with prepared_command(code_content, args, auto_install) as cmd:
+            process = subprocess.Popen(cmd)
+            reported = False
+            try:
+                while True:
+                    time.sleep(interval)
+                    if not reported and process.poll() is not None:
+                        print_info(f"Script exited with code {process.returncode}. Watching for changes...")
+                        reported = True
+                    try:
+                        new_content, etag = fetch_url_conditional(full_url, etag)
+                    except RateLimitError:
+                        print_warning("Rate limit hit while polling; will retry.")
+                        continue
+                    if new_content is not None and new_content != code_content:
+                        break
+            finally:
+                if process.poll() is None:
+                    process.terminate()
+                    try:
+                        process.wait(timeout=5)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                        process.wait()
+
+        print_info("Change detected, re-running script...")
+        code_content = new_content
 
 def install_tool(url: str, name: str) -> str:
     """Installs a remote script as a local command."""
     full_url = resolve_url(url)
-    raw_url = convert_to_raw_url(full_url)
+    raw_url = resolve_raw_url(full_url)
     content = fetch_url_content(raw_url)
     
     if not content:
@@ -119,35 +189,102 @@ def scan_dependencies(code: str) -> List[str]:
             missing.append(imp)
     return missing
 
-def search_repository(repo_url: str, query: str) -> List[Dict[str, str]]:
-    owner, repo = get_repo_details(repo_url)
-    if not owner: raise ValueError("Invalid Repo URL")
-    
-    # Smart branch detection happens in network.py
-    data = fetch_tree_recursively(owner, repo)
-    if not data or "tree" not in data:
+def _search_index(owner: str, repo: str, query: str, mode: str, limit: Optional[int]) -> List[Dict[str, str]]:
+    # Raw links point at the commit the index was built from
+    ref, sha = resolve_ref(owner, repo)
+    index = fetch_path_index(owner, repo, sha or ref)
+    if not index:
         return []
 
-    results = []
-    query_lower = query.lower()
-    
-    # Try to determine branch from data url or default to main for raw links
-    branch = "main" 
-
-    for item in data["tree"]:
-        path = item["path"]
-        if query_lower in path.lower():
-            raw_link = f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{path}"
-            results.append({"path": path, "type": item["type"], "raw_url": raw_link})
+    with index:
+        if index.truncated:
+            print_warning(f"{owner}/{repo} is too large for GitHub to list in full; results may be incomplete.")
+        if mode == "substring":
+            hits = index.search(query, limit)
+        elif mode == "glob":
+            hits = index.glob(query, limit)
+        elif mode == "fuzzy":
+            hits = index.fuzzy(query, limit)
+        else:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        results = []
+        for i in hits:
+            path, item_type, blob_sha = index.entry(i)
+            raw_link = f"https://raw.githubusercontent.com/{owner}/{repo}/{sha or ref}/{path}"
+            results.append({"path": path, "type": item_type, "sha": blob_sha, "raw_url": raw_link})
     return results
 
+def search_repository(repo_url: str, query: str, mode: str = "substring", limit: Optional[int] = None) -> List[Dict[str, str]]:
+    """
+    Searches file paths in a repo.
+    `mode` is "substring" (default), "glob" (e.g. `*.py`, `src/**/test_*.py`)
+    or "fuzzy" (ranked subsequence match). All modes are case-insensitive.
+    """
+    owner, repo = get_repo_details(repo_url)
+    if not owner: raise ValueError("Invalid Repo URL")
+    if mode not in ("substring", "glob", "fuzzy"):
+        raise ValueError(f"Unknown search mode: {mode}")
+    return _search_index(owner, repo, query, mode, limit)
+
+def search_owner(owner: str, query: str, kind: str = "org", mode: str = "substring",
+                 limit: Optional[int] = None, workers: int = 8, reserve: int = 50) -> Iterator[Dict[str, str]]:
+    """
+    Searches every repo of an organization or user (see search_repository
+    for `mode`; `limit` applies per repo). Repos are searched `workers` at
+    a time and matches are yielded as each repo finishes, with a "repo" key
+    added. No new repos are started once the remaining API quota drops to
+    `reserve`; trees already cached cost nothing to search again.
+    """
+    if mode not in ("substring", "glob", "fuzzy"):
+        raise ValueError(f"Unknown search mode: {mode}")
+
+    # Empty repos have no tree to fetch
+    pending = [r["name"] for r in list_owner_repos(owner, kind) if r.get("size")]
+    skipped = 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="githrun-find") as pool:
+        running = {}
+        try:
+            while pending or running:
+                remaining = rate_limit_status()["remaining"]
+                while pending and len(running) < workers:
+                    if remaining is not None and remaining <= reserve:
+                        skipped += len(pending)
+                        pending = []
+                        break
+                    name = pending.pop(0)
+                    running[pool.submit(_search_index, owner, name, query, mode, limit)] = name
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results = future.result()
+                    except RateLimitError:
+                        skipped += 1 + len(pending)
+                        pending = []
+                        continue
+                    for item in results:
+                        item["repo"] = f"{owner}/{name}"
+                        yield item
+        finally:
+            # Stop early if the caller abandons the generator
+            for future in running:
+                future.cancel()
+
+    if skipped:
+        print_warning(f"Skipped {skipped} repositories to stay within the API rate limit.")
+
 def get_folder_contents(url: str) -> List[Dict]:
     items = fetch_folder_contents(url)
     return items if items else []
 
 def download_file(url: str, output_path: Optional[str] = None) -> str:
     full_url = resolve_url(url)
-    raw_url = convert_to_raw_url(full_url)
+    raw_url = resolve_raw_url(full_url)
     
     if raw_url.startswith("gist:"):
         content = fetch_gist_content(raw_url.split(":")[1])
@@ -176,25 +313,32 @@ def download_folder(url: str, output_dir: Optional[str] = None) -> str:
     if len(parts) < 5 or parts[2] != "tree":
          raise ValueError("Invalid tree URL")
     
+    ref, sha = resolve_ref(owner, repo, parts[3])
+    commit = sha or ref
     target_path = "/".join(parts[4:])
     if not output_dir: output_dir = parts[-1]
     
-    data = fetch_tree_recursively(owner, repo) # branch auto-detected
+    data = fetch_tree_recursively(owner, repo, commit)
     if not data: raise ValueError("Could not fetch tree")
     
+    blobs = [
+        item for item in data["tree"]
+        if item['type'] == 'blob' and (item['path'] + "/").startswith(target_path.rstrip("/") + "/")
+    ]
+    # Small text files are fetched in batches, the rest one by one
+    contents = fetch_files(owner, repo, commit, [b['path'] for b in blobs], {b['path']: b.get('size', 0) for b in blobs})
+
     count = 0
     os.makedirs(output_dir, exist_ok=True)
-    for item in data["tree"]:
-        if item['path'].startswith(target_path) and item['type'] == 'blob':
-            rel = item['path'][len(target_path):].strip("/")
-            local = os.path.join(output_dir, rel)
-            os.makedirs(os.path.dirname(local), exist_ok=True)
-            # Fetch
-            raw = f"https://raw.githubusercontent.com/{owner}/{repo}/main/{item['path']}"
-            c = fetch_url_content(raw)
-            if c:
-                with open(local, "w", encoding="utf-8") as f: f.write(c)
-                count += 1
+    for item in blobs:
+        c = contents.get(item['path'])
+        if c is None:
+            continue
+        rel = item['path'][len(target_path):].strip("/") or os.path.basename(item['path'])
+        local = os.path.join(output_dir, rel)
+        os.makedirs(os.path.dirname(local), exist_ok=True)
+        with open(local, "wb") as f: f.write(c)
+        count += 1
     return f"{output_dir} ({count} files)"
 
 # Config Wrappers for CLI
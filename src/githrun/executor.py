@@ -0,0 +1,390 @@
+import os
+import sys
+import time
+import signal
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Iterator, Tuple
+from .core import fetch_remote_code, prepared_command
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Applies rlimits in the child and then execs the real command. Doing this
+# in a separate interpreter keeps it safe with the pool's worker threads,
+# unlike subprocess's preexec_fn.
+_LIMITS_SHIM = (
+    "import os, resource, sys\n"
+    "cpu, mem = int(sys.argv[1]), int(sys.argv[2])\n"
+    "if cpu > 0: resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))\n"
+    "if mem > 0: resource.setrlimit(resource.RLIMIT_AS, (mem, mem))\n"
+    "os.execv(sys.argv[3], sys.argv[3:])\n"
+)
+
+DEFAULT_MAX_OUTPUT = 16 * 1024 * 1024  # bytes of stdout + stderr kept per job
+_READ_CHUNK = 64 * 1024
+
+class QueueFullError(Exception):
+    pass
+
+class ExecutionResult:
+    """Final outcome of a job run through an ExecutionPool."""
+
+    def __init__(self, returncode: Optional[int], stdout: str, stderr: str, timed_out: bool, metrics: Dict):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.metrics = metrics
+
+    def __repr__(self):
+        return f"ExecutionResult(returncode={self.returncode}, timed_out={self.timed_out})"
+
+class ExecutionHandle:
+    """
+    Tracks one job submitted to an ExecutionPool.
+    State goes queued -> running -> finished, or ends in failed/cancelled.
+    """
+
+    def __init__(self, url: str, args: List[str], auto_install: bool,
+                 timeout: Optional[float], cpu_seconds: Optional[int], memory_mb: Optional[int],
+                 max_output: Optional[int] = DEFAULT_MAX_OUTPUT):
+        self.url = url
+        self.args = args or []
+        self.auto_install = auto_install
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_output = max_output
+
+        self.state = "queued"
+        self.pid = None
+        self.returncode = None
+        self.timed_out = False
+        self.error = None
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cpu_time = None
+        self.max_rss_kb = None
+        self.output_truncated = False
+
+        self._output = []  # (stream name, line) in arrival order
+        self._output_bytes = 0
+        self._cond = threading.Condition()
+        self._process = None
+        self._cancelled = False
+        self._future = None
+
+    def __repr__(self):
+        return f"ExecutionHandle(url={self.url!r}, state={self.state!r})"
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("finished", "failed", "cancelled")
+
+    @property
+    def stdout(self) -> str:
+        with self._cond:
+            return "".join(line for name, line in self._output if name == "stdout")
+
+    @property
+    def stderr(self) -> str:
+        with self._cond:
+            return "".join(line for name, line in self._output if name == "stderr")
+
+    @property
+    def metrics(self) -> Dict:
+        end = self.finished_at or time.time()
+        return {
+            "queue_time": (self.started_at or end) - self.queued_at,
+            "run_time": end - self.started_at if self.started_at else None,
+            "cpu_time": self.cpu_time,
+            "max_rss_kb": self.max_rss_kb,
+            "output_truncated": self.output_truncated,
+        }
+
+    def stream(self) -> Iterator[Tuple[str, str]]:
+        """Yields ("stdout" | "stderr", line) pairs as they are produced, until the job ends."""
+        pos = 0
+        while True:
+            with self._cond:
+                while pos == len(self._output) and not self.done:
+                    self._cond.wait()
+                pending = self._output[pos:]
+                finished = self.done
+            for item in pending:
+                yield item
+            pos += len(pending)
+            if finished and not pending:
+                return
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the job ends. Returns False if `timeout` expired first."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.done, timeout)
+
+    def result(self, timeout: Optional[float] = None) -> ExecutionResult:
+        if not self.wait(timeout):
+            raise TimeoutError(f"Job for {self.url} is still {self.state}")
+        if self.error:
+            raise self.error
+        return ExecutionResult(self.returncode, self.stdout, self.stderr, self.timed_out, self.metrics)
+
+    def cancel(self) -> bool:
+        """Drops a queued job or kills a running one. Returns False if it already ended."""
+        with self._cond:
+            if self.done:
+                return False
+            self._cancelled = True
+            if self.state == "queued" and self._future is not None and self._future.cancel():
+                self._finish("cancelled")
+                return True
+        self._kill()
+        return True
+
+    # --- worker side ---
+
+    def _finish(self, state: str):
+        # Caller holds self._cond
+        self.state = state
+        self.finished_at = time.time()
+        self._cond.notify_all()
+
+    def _append(self, name: str, line: str):
+        with self._cond:
+            if self.output_truncated:
+                # Keep draining the pipe so the script doesn't block, but drop the rest
+                return
+            if self.max_output:
+                size = len(line.encode("utf-8"))
+                if self._output_bytes + size > self.max_output:
+                    self.output_truncated = True
+                    line = f"[githrun] Output truncated after {self._output_bytes} bytes.\n"
+                    name = "stderr"
+                else:
+                    self._output_bytes += size
+            self._output.append((name, line))
+            self._cond.notify_all()
+
+    def _pump(self, name: str, pipe):
+        # Bounded reads, so output without newlines can't build one huge line
+        for line in iter(lambda: pipe.readline(_READ_CHUNK), ""):
+            self._append(name, line)
+        pipe.close()
+
+    def _kill(self, leftovers: bool = False):
+        # `leftovers` also reaches children still running after the script exited
+        process = self._process
+        if process is None or (process.returncode is not None and not leftovers):
+            return
+        try:
+            if os.name == "nt":
+                process.kill()
+            else:
+                # The job runs in its own session, so this also reaches its children
+                os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    def _on_timeout(self):
+        self.timed_out = True
+        self._kill()
+
+    def _limited(self, cmd: List[str]) -> List[str]:
+        if resource is None or not (self.cpu_seconds or self.memory_mb):
+            return cmd
+        memory = int(self.memory_mb * 1024 * 1024) if self.memory_mb else 0
+        return [sys.executable, "-c", _LIMITS_SHIM, str(int(self.cpu_seconds or 0)), str(memory)] + cmd
+
+    def _wait_process(self, process: subprocess.Popen):
+        if not hasattr(os, "wait4"):
+            process.wait()
+            return
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        self.cpu_time = usage.ru_utime + usage.ru_stime
+        # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+        self.max_rss_kb = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+
+    def _launch_timeout(self) -> TimeoutError:
+        return TimeoutError(f"Job for {self.url} exceeded its {self.timeout}s timeout before the script started")
+
+    def _out_of_time(self, deadline: Optional[float]) -> bool:
+        """Ends the job before launch if it was cancelled or its deadline passed."""
+        with self._cond:
+            if self._cancelled:
+                self._finish("cancelled")
+                return True
+            if deadline and time.time() >= deadline:
+                self.timed_out = True
+                self.error = self._launch_timeout()
+                self._finish("failed")
+                return True
+        return False
+
+    def _run(self):
+        with self._cond:
+            if self._cancelled:
+                self._finish("cancelled")
+                return
+            self.state = "running"
+            self.started_at = time.time()
+            self._cond.notify_all()
+
+        # The wall-clock budget covers fetching and dependency setup too
+        deadline = self.started_at + self.timeout if self.timeout else None
+
+        def remaining():
+            return max(deadline - time.time(), 0) if deadline else None
+
+        try:
+            code = fetch_remote_code(self.url, remaining())
+            if self._out_of_time(deadline):
+                return
+            with prepared_command(code, self.args, self.auto_install, remaining()) as cmd:
+                if self._out_of_time(deadline):
+                    return
+                self._process = subprocess.Popen(
+                    self._limited(cmd),
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    encoding="utf-8",
+                    errors="replace",
+                    start_new_session=os.name != "nt",
+                )
+                self.pid = self._process.pid
+                if self._cancelled:
+                    self._kill()
+
+                readers = [
+                    threading.Thread(target=self._pump, args=("stdout", self._process.stdout), daemon=True),
+                    threading.Thread(target=self._pump, args=("stderr", self._process.stderr), daemon=True),
+                ]
+                for reader in readers:
+                    reader.start()
+
+                timer = threading.Timer(remaining(), self._on_timeout) if deadline else None
+                if timer:
+                    timer.daemon = True
+                    timer.start()
+                try:
+                    self._wait_process(self._process)
+                    if os.name != "nt":
+                        # The job ends with its script; children still holding
+                        # the pipes would otherwise keep the readers waiting
+                        self._kill(leftovers=True)
+                    for reader in readers:
+                        reader.join(remaining())
+                finally:
+                    if timer:
+                        timer.cancel()
+                if any(reader.is_alive() for reader in readers):
+                    self.timed_out = True
+        except Exception as e:
+            with self._cond:
+                if isinstance(e, subprocess.TimeoutExpired) or (deadline and time.time() >= deadline):
+                    # A stalled fetch or install shows up as a timeout, whatever it raised
+                    self.timed_out = True
+                    e = self._launch_timeout()
+                self.error = e
+                self._finish("failed")
+            return
+
+        with self._cond:
+            self.returncode = self._process.returncode
+            self._finish("cancelled" if self._cancelled else "finished")
+
+class ExecutionPool:
+    """
+    Runs remote scripts on a bounded set of worker threads.
+
+    At most `max_workers` jobs run at once; up to `max_queue` more wait in
+    line (unbounded if None). Per-job `timeout` is wall-clock seconds;
+    `cpu_seconds` and `memory_mb` are enforced with rlimits on POSIX and
+    ignored on Windows. `max_output` caps the bytes of output kept per job
+    (0 for no cap); later output is dropped and the job's metrics report
+    `output_truncated`. Values given to `submit` override the pool defaults.
+    A job ends when its script exits; on POSIX any processes it left running
+    are killed then.
+
+        with ExecutionPool(max_workers=4, timeout=60) as pool:
+            job = pool.submit("https://github.com/user/repo/blob/main/task.py")
+            for stream, line in job.stream():
+                print(stream, line, end="")
+            print(job.result().returncode, job.metrics)
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: Optional[int] = None,
+                 timeout: Optional[float] = None, cpu_seconds: Optional[int] = None,
+                 memory_mb: Optional[int] = None, max_output: int = DEFAULT_MAX_OUTPUT):
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_output = max_output
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="githrun-exec")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue) if max_queue is not None else None
+        self._lock = threading.Lock()
+        self._handles = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def submit(self, url: str, args: List[str] = None, auto_install: bool = False,
+               timeout: Optional[float] = None, cpu_seconds: Optional[int] = None,
+               memory_mb: Optional[int] = None, max_output: Optional[int] = None,
+               block: bool = True) -> ExecutionHandle:
+        """
+        Queues a script and returns its handle immediately.
+        When the queue is full, waits for a free slot, or raises
+        QueueFullError if `block` is False.
+        """
+        if self._slots is not None and not self._slots.acquire(blocking=block):
+            raise QueueFullError("Execution queue is full.")
+
+        handle = ExecutionHandle(
+            url, args, auto_install,
+            timeout if timeout is not None else self.timeout,
+            cpu_seconds if cpu_seconds is not None else self.cpu_seconds,
+            memory_mb if memory_mb is not None else self.memory_mb,
+            max_output if max_output is not None else self.max_output,
+        )
+        try:
+            handle._future = self._executor.submit(handle._run)
+        except Exception:
+            if self._slots is not None:
+                self._slots.release()
+            raise
+        if self._slots is not None:
+            handle._future.add_done_callback(lambda _: self._slots.release())
+
+        with self._lock:
+            self._handles = [h for h in self._handles if not h.done] + [handle]
+        return handle
+
+    def stats(self) -> Dict[str, int]:
+        """Counts of jobs the pool is currently tracking, by state."""
+        with self._lock:
+            handles = list(self._handles)
+        counts = {"queued": 0, "running": 0}
+        for h in handles:
+            if h.state in counts:
+                counts[h.state] += 1
+        return counts
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        if cancel_pending:
+            with self._lock:
+                handles = list(self._handles)
+            for h in handles:
+                if h.state == "queued":
+                    h.cancel()
+        self._executor.shutdown(wait=wait)
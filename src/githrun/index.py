@@ -0,0 +1,275 @@
+import re
+import sys
+import mmap
+import time
+import heapq
+import struct
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import List, Optional, Tuple
+from .utils import atomic_open
+
+# On-disk layout (all offsets relative to the start of their column):
+#   header | path offsets (N+1 x u32) | search offsets (N+1 x u32)
+#   | type codes (N x u8) | shas (N x 20 bytes) | paths | search column
+# The search column holds every path lowercased and terminated by "\n",
+# so queries can run straight over the mapped bytes with `re`.
+INDEX_MAGIC = b"GHRI"
+INDEX_VERSION = 2
+HEADER = struct.Struct("<4sHBBdIII")  # magic, version, little-endian flag, truncated flag, timestamp, count, path bytes, search bytes
+SHA_SIZE = 20
+TYPE_NAMES = ("blob", "tree", "commit")
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+_OFFSET_TYPE = "I" if array("I").itemsize == 4 else "L"
+
+def build_index(tree: List[dict], index_file: Path, truncated: bool = False):
+    """
+    Writes a compact index for the entries of a recursive tree listing.
+    `truncated` records that GitHub cut the listing short, so readers can warn.
+    """
+    path_offsets = array(_OFFSET_TYPE, [0])
+    search_offsets = array(_OFFSET_TYPE, [0])
+    types = bytearray()
+    shas = bytearray()
+    paths = bytearray()
+    search = bytearray()
+
+    for item in tree:
+        path = item["path"]
+        paths += path.encode("utf-8")
+        search += path.lower().encode("utf-8") + b"\n"
+        path_offsets.append(len(paths))
+        search_offsets.append(len(search))
+        types.append(TYPE_CODES.get(item.get("type"), TYPE_CODES["blob"]))
+        try:
+            shas += bytes.fromhex(item.get("sha") or "").ljust(SHA_SIZE, b"\0")[:SHA_SIZE]
+        except ValueError:
+            shas += bytes(SHA_SIZE)
+
+    header = HEADER.pack(
+        INDEX_MAGIC, INDEX_VERSION, sys.byteorder == "little", bool(truncated),
+        time.time(), len(types), len(paths), len(search)
+    )
+    with atomic_open(index_file, "wb") as f:
+        f.write(header)
+        f.write(path_offsets.tobytes())
+        f.write(search_offsets.tobytes())
+        f.write(types)
+        f.write(shas)
+        f.write(paths)
+        f.write(search)
+
+def open_index(index_file: Path, max_age: Optional[float] = None) -> Optional["PathIndex"]:
+    """Maps an index file, or returns None if it is missing, stale or unreadable."""
+    try:
+        index = PathIndex(index_file)
+    except (OSError, ValueError):
+        return None
+    if max_age is not None and time.time() - index.timestamp >= max_age:
+        index.close()
+        return None
+    return index
+
+def _glob_to_regex(pattern: str) -> bytes:
+    """Translates a glob into a line-anchored regex over the search column.
+
+    `*` and `?` stay within one path segment, `**` spans segments. Patterns
+    without a `/` are matched against the file name only.
+    """
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i):
+                i += 2
+                if i < n and pattern[i] == "/":
+                    out.append("(?:[^\n]*/)?")
+                    i += 1
+                else:
+                    out.append("[^\n]*")
+                continue
+            out.append("[^/\n]*")
+        elif c == "?":
+            out.append("[^/\n]")
+        elif c == "[":
+            # Same bracket rules as fnmatch: a leading "]" is literal and
+            # an unclosed "[" matches itself
+            j = i + 1
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            j = pattern.find("]", j)
+            if j < 0:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                negate = body.startswith("!")
+                if negate:
+                    body = body[1:]
+                body = re.sub(r"([\\&~|\[])", r"\\\1", body)
+                if body.startswith("^"):
+                    body = "\\" + body
+                out.append(("[^/\n" if negate else "[") + body + "]")
+                i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+
+    prefix = "^" if "/" in pattern else "^(?:[^\n]*/)?"
+    return ("(?m)" + prefix + "".join(out) + "$").encode("utf-8")
+
+def _fuzzy_score(query: str, text: str) -> Optional[float]:
+    """Scores `query` as a subsequence of `text`; higher is better."""
+    base = text.rfind("/") + 1
+    best = None
+    for start in (base, 0):
+        score = 0.0
+        pos, prev = start, -2
+        for ch in query:
+            i = text.find(ch, pos)
+            if i < 0:
+                score = None
+                break
+            score += 1
+            if i == prev + 1:
+                score += 4
+            if i == 0 or text[i - 1] in "/_-. ":
+                score += 3
+            if i >= base:
+                score += 2
+            prev, pos = i, i + 1
+        if score is not None and (best is None or score > best):
+            best = score
+
+    if best is None:
+        return None
+    name = text[base:]
+    if name == query or name.rsplit(".", 1)[0] == query:
+        best += 20
+    # Prefer shorter paths among otherwise equal matches
+    return best - len(text) * 0.01
+
+class PathIndex:
+    """Read-only, memory-mapped view of an index written by `build_index`."""
+
+    def __init__(self, index_file: Path):
+        with open(index_file, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._mm) < HEADER.size:
+                raise ValueError("Truncated index")
+            magic, version, little, truncated, timestamp, count, path_len, search_len = HEADER.unpack_from(self._mm, 0)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION or bool(little) != (sys.byteorder == "little"):
+                raise ValueError("Incompatible index")
+
+            offsets_len = (count + 1) * 4
+            pos = HEADER.size
+            layout = []
+            for size in (offsets_len, offsets_len, count, count * SHA_SIZE, path_len, search_len):
+                layout.append((pos, pos + size))
+                pos += size
+            if pos != len(self._mm):
+                raise ValueError("Corrupt index")
+        except Exception:
+            self._mm.close()
+            raise
+
+        self.timestamp = timestamp
+        self.truncated = bool(truncated)
+        self._count = count
+        view = memoryview(self._mm)
+        self._views = [view[a:b] for a, b in layout]
+        self._path_offsets = self._views[0].cast(_OFFSET_TYPE)
+        self._search_offsets = self._views[1].cast(_OFFSET_TYPE)
+        self._types, self._shas, self._paths, self._search = self._views[2:]
+        self._views += [self._path_offsets, self._search_offsets, view]
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._mm.closed:
+            return
+        for view in reversed(self._views):
+            view.release()
+        self._mm.close()
+
+    def path(self, i: int) -> str:
+        return bytes(self._paths[self._path_offsets[i]:self._path_offsets[i + 1]]).decode("utf-8")
+
+    def type(self, i: int) -> str:
+        return TYPE_NAMES[self._types[i]]
+
+    def sha(self, i: int) -> str:
+        return self._shas[i * SHA_SIZE:(i + 1) * SHA_SIZE].hex()
+
+    def entry(self, i: int) -> Tuple[str, str, str]:
+        return self.path(i), self.type(i), self.sha(i)
+
+    def _line_of(self, pos: int) -> int:
+        return bisect_right(self._search_offsets, pos) - 1
+
+    def _lines(self, regex, limit: Optional[int] = None) -> List[int]:
+        hits = []
+        last = -1
+        for m in re.finditer(regex, self._search):
+            i = self._line_of(m.start())
+            # Patterns that match "" also match after the final newline
+            if i == last or i >= self._count:
+                continue
+            hits.append(i)
+            last = i
+            if limit is not None and len(hits) >= limit:
+                break
+        return hits
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """Case-insensitive substring match, in tree order."""
+        if not query:
+            return list(range(self._count if limit is None else min(limit, self._count)))
+        return self._lines(re.escape(query.lower().encode("utf-8")), limit)
+
+    def glob(self, pattern: str, limit: Optional[int] = None) -> List[int]:
+        """Case-insensitive glob match, in tree order."""
+        try:
+            regex = re.compile(_glob_to_regex(pattern.lower()))
+        except re.error as e:
+            raise ValueError(f"Invalid glob pattern: {pattern} ({e})") from None
+        return self._lines(regex, limit)
+
+    def fuzzy(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """Subsequence match ranked by `_fuzzy_score`, best first."""
+        query = query.lower()
+        if not query:
+            return self.search(query, limit)
+
+        # Let `re` discard non-matching lines before scoring in Python. Each
+        # step skips to the next occurrence of its character, so a line that
+        # almost matches fails in linear time instead of backtracking.
+        steps = []
+        for c in query:
+            char = re.escape(c.encode("utf-8"))
+            # A multi-byte character can't go in a byte class
+            steps.append((b"[^" + char + b"\n]*" if len(c.encode("utf-8")) == 1 else b"[^\n]*?") + char)
+        regex = b"(?m)^" + b"".join(steps)
+        scored = []
+        for i in self._lines(regex):
+            text = bytes(self._search[self._search_offsets[i]:self._search_offsets[i + 1] - 1]).decode("utf-8")
+            score = _fuzzy_score(query, text)
+            if score is not None:
+                scored.append((score, -i))
+
+        if limit is None:
+            scored.sort(reverse=True)
+        else:
+            scored = heapq.nlargest(limit, scored)
+        return [-neg for _, neg in scored]
@@ -1,10 +1,52 @@
+import os
+import re
+import json
+import hashlib
+import threading
 import requests
-from urllib.parse import urlparse
-from .utils import print_error, load_cache, save_cache, ConfigManager
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, quote
+from .utils import (
+    print_error, print_warning, load_cache, save_cache, single_flight, cache_lock, cache_name, ensure_dirs,
+    ConfigManager, CACHE_DIR, SHARED_CACHE_DIR, CACHE_DURATION
+)
+from .index import build_index, open_index
+
+GRAPHQL_URL = os.environ.get("GITHRUN_GRAPHQL_URL", "https://api.github.com/graphql")
+GRAPHQL_BATCH_SIZE = 50  # blobs per query
+GRAPHQL_MAX_BLOB_SIZE = 256 * 1024  # larger blobs go straight to raw fetches
+
+# Ref resolution: default branches rarely change, branch heads are
+# revalidated with a conditional request (a 304 is cheap), and anything
+# keyed by a commit SHA is immutable.
+DEFAULT_BRANCH_DURATION = 7 * 24 * 3600
+REF_CHECK_INTERVAL = CACHE_DURATION
+REF_CACHE_DURATION = 30 * 24 * 3600
+COMMIT_CACHE_DURATION = 30 * 24 * 3600
+_SHA_RE = re.compile(r"[0-9a-f]{40}")
+
+# Anonymous Gist polling goes through the API (60 requests/hr, 304s included)
+ANONYMOUS_GIST_POLL_INTERVAL = 120
 
 class RateLimitError(Exception):
     pass
 
+# Last X-RateLimit-Remaining seen from the REST API, and API calls made by this process
+_rate_lock = threading.Lock()
+_rate_state = {"remaining": None, "requests": 0}
+
+def _note_rate_limit(resp):
+    with _rate_lock:
+        _rate_state["requests"] += 1
+        remaining = resp.headers.get("X-RateLimit-Remaining")
+        if remaining is not None and remaining.isdigit():
+            _rate_state["remaining"] = int(remaining)
+
+def rate_limit_status() -> Dict[str, Optional[int]]:
+    """Returns {"remaining": last known quota or None, "requests": API calls made so far}."""
+    with _rate_lock:
+        return dict(_rate_state)
+
 def get_auth_headers():
     token = ConfigManager.get_api_key()
     if token:
@@ -35,11 +77,33 @@ def convert_to_raw_url(url: str) -> str:
             
     return url
 
-def fetch_url_content(url: str) -> str:
+def resolve_raw_url(url: str, timeout: Optional[float] = None) -> str:
+    """Like convert_to_raw_url, but pins GitHub file URLs to the commit their branch currently points at."""
+    raw_url = convert_to_raw_url(url)
+    prefix = "https://raw.githubusercontent.com/"
+    if not raw_url.startswith(prefix):
+        return raw_url
+
+    parts = raw_url[len(prefix):].split("/")
+    if len(parts) < 4:
+        return raw_url
+    owner, repo, ref = parts[0], parts[1], parts[2]
+    return build_raw_url(owner, repo, ref, "/".join(parts[3:]), timeout)
+
+def build_raw_url(owner: str, repo: str, ref: Optional[str], path: str, timeout: Optional[float] = None) -> str:
+    """Raw file URL at the resolved commit (falls back to the ref name if it can't be resolved)."""
+    try:
+        ref, sha = resolve_ref(owner, repo, ref, timeout)
+    except RateLimitError:
+        # Raw downloads aren't API-metered, so pinning must never block them
+        ref, sha = ref or "HEAD", None
+    return f"https://raw.githubusercontent.com/{owner}/{repo}/{sha or ref}/{path}"
+
+def fetch_url_content(url: str, timeout: Optional[float] = None) -> str:
     try:
         # For raw.githubusercontent.com, headers usually aren't needed but auth helps with private repos
         headers = get_auth_headers()
-        response = requests.get(url, headers=headers)
+        response = requests.get(url, headers=headers, timeout=timeout)
         
         if response.status_code == 404 and "Authorization" in headers:
             # Fallback: Sometimes raw links for private repos behave differently
@@ -55,9 +119,116 @@ def fetch_url_content(url: str) -> str:
             print_error(f"Failed to download: {e}")
         return None
 
-def fetch_gist_content(gist_id: str):
+def fetch_url_bytes(url: str) -> Optional[bytes]:
+    """Like fetch_url_content, but returns the raw bytes (safe for binary files)."""
+    try:
+        response = requests.get(url, headers=get_auth_headers())
+        response.raise_for_status()
+        return response.content
+    except requests.RequestException as e:
+        print_error(f"Failed to download {url}: {e}")
+        return None
+
+def _fetch_blobs_graphql(owner: str, repo: str, ref: str, paths: List[str]) -> Dict[str, bytes]:
+    """
+    Fetches the text of many blobs in one GraphQL query.
+    Paths that are missing, binary or truncated are left out of the result.
+    """
+    variables = {"owner": owner, "name": repo}
+    params, fields = [], []
+    for i, path in enumerate(paths):
+        variables[f"e{i}"] = f"{ref}:{path}"
+        params.append(f"$e{i}: String!")
+        fields.append(f"f{i}: object(expression: $e{i}) {{ ... on Blob {{ text isBinary isTruncated }} }}")
+
+    query = (
+        f"query($owner: String!, $name: String!, {', '.join(params)}) {{ "
+        f"repository(owner: $owner, name: $name) {{ {' '.join(fields)} }} }}"
+    )
+    try:
+        resp = requests.post(GRAPHQL_URL, json={"query": query, "variables": variables}, headers=get_auth_headers())
+        if resp.status_code != 200:
+            return {}
+        repository = (resp.json().get("data") or {}).get("repository") or {}
+    except (requests.RequestException, ValueError):
+        return {}
+
+    blobs = {}
+    for i, path in enumerate(paths):
+        blob = repository.get(f"f{i}")
+        if blob and blob.get("text") is not None and not blob.get("isBinary") and not blob.get("isTruncated"):
+            blobs[path] = blob["text"].encode("utf-8")
+    return blobs
+
+def fetch_files(owner: str, repo: str, ref: str, paths: List[str], sizes: Optional[Dict[str, int]] = None) -> Dict[str, Optional[bytes]]:
+    """
+    Fetches many files from one ref, returning {path: bytes or None}.
+
+    When logged in, small text blobs are pulled GRAPHQL_BATCH_SIZE at a time
+    through the GraphQL API. Everything else (binaries, blobs over
+    GRAPHQL_MAX_BLOB_SIZE, GraphQL failures, anonymous use) falls back to one
+    raw fetch per file.
+    """
+    sizes = sizes or {}
+    contents = {}
+
+    if ConfigManager.get_api_key():
+        small = [p for p in paths if sizes.get(p, 0) <= GRAPHQL_MAX_BLOB_SIZE]
+        for start in range(0, len(small), GRAPHQL_BATCH_SIZE):
+            contents.update(_fetch_blobs_graphql(owner, repo, ref, small[start:start + GRAPHQL_BATCH_SIZE]))
+
+    for path in paths:
+        if path not in contents:
+            contents[path] = fetch_url_bytes(f"https://raw.githubusercontent.com/{owner}/{repo}/{ref}/{path}")
+    return contents
+
+def fetch_url_conditional(url: str, etag: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Fetches a script only if it changed since `etag`, for cheap polling.
+    Returns (content, etag); content is None when unchanged or unreachable.
+    Polling follows the branch rather than a pinned commit. When logged in,
+    GitHub files are polled through the contents API (authenticated 304s are
+    free). Anonymous polls use raw.githubusercontent.com, which is not
+    API-metered but may serve a cached copy for a few minutes. Gists always
+    go through the Gist API; see min_poll_interval.
+    """
+    raw_url = convert_to_raw_url(url)
+    accept = None
+    if raw_url.startswith("gist:"):
+        poll_url = f"https://api.github.com/gists/{raw_url.split(':')[1]}"
+    elif raw_url.startswith("https://raw.githubusercontent.com/") and ConfigManager.get_api_key():
+        parts = raw_url[len("https://raw.githubusercontent.com/"):].split("/")
+        if len(parts) < 4:
+            return None, etag
+        owner, repo, ref, path = parts[0], parts[1], parts[2], "/".join(parts[3:])
+        poll_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}?ref={quote(ref, safe='')}"
+        accept = "application/vnd.github.raw"
+    else:
+        poll_url = raw_url
+
+    status, body, new_etag = _conditional_get(poll_url, etag=etag, accept=accept)
+    if status != 200:
+        return None, etag
+
+    if raw_url.startswith("gist:"):
+        try:
+            files = json.loads(body).get("files", {})
+        except ValueError:
+            return None, etag
+        if not files:
+            return None, etag
+        body = list(files.values())[0].get("content")
+    return body, new_etag
+
+def min_poll_interval(url: str) -> float:
+    """Shortest sensible polling interval for fetch_url_conditional on `url`."""
+    if convert_to_raw_url(url).startswith("gist:") and not ConfigManager.get_api_key():
+        return ANONYMOUS_GIST_POLL_INTERVAL
+    return 0
+
+def fetch_gist_content(gist_id: str, timeout: Optional[float] = None):
     api_url = f"https://api.github.com/gists/{gist_id}"
-    data = _fetch_api(api_url)
+    data = _fetch_api(api_url, timeout)
     if data:
         files = data.get("files", {})
         if files:
@@ -70,50 +241,206 @@ def get_repo_details(url: str):
         return parts[0], parts[1]
     return None, None
 
-def fetch_tree_recursively(owner: str, repo: str, branch: str = None):
-    cache_key = f"{owner}_{repo}_{branch or 'default'}_tree"
-    
-    cached = load_cache(cache_key)
-    if cached: return cached
-
-    # Determine branch if not provided
-    if not branch:
-        # Try to guess default branch
-        repo_info = _fetch_api(f"https://api.github.com/repos/{owner}/{repo}")
-        if repo_info:
-            branch = repo_info.get("default_branch", "main")
+def resolve_default_branch(owner: str, repo: str, timeout: Optional[float] = None) -> str:
+    def fetch():
+        repo_info = _fetch_api(f"https://api.github.com/repos/{owner}/{repo}", timeout)
+        return repo_info.get("default_branch") if repo_info else None
+
+    return single_flight(f"{owner}_{repo}_default_branch", fetch, DEFAULT_BRANCH_DURATION) or "main"
+
+def resolve_ref(owner: str, repo: str, ref: Optional[str] = None, timeout: Optional[float] = None) -> Tuple[str, Optional[str]]:
+    """
+    Returns (ref, commit sha) for a branch/tag, or the default branch if `ref` is None.
+    The SHA is None only if it could not be resolved and was never cached.
+    """
+    ref = ref or resolve_default_branch(owner, repo, timeout)
+    if _SHA_RE.fullmatch(ref):
+        return ref, ref
+
+    cache_key = f"{owner}_{repo}_ref_{ref}"
+    # Only trust our own recent checks; a shared layer may be arbitrarily old
+    fresh = load_cache(cache_key, REF_CHECK_INTERVAL, shared=False)
+    if fresh: return ref, fresh["sha"]
+
+    with cache_lock(cache_key):
+        fresh = load_cache(cache_key, REF_CHECK_INTERVAL, shared=False)
+        if fresh: return ref, fresh["sha"]
+
+        known = load_cache(cache_key, REF_CACHE_DURATION)
+        try:
+            status, body, etag = _conditional_get(
+                f"https://api.github.com/repos/{owner}/{repo}/commits/{quote(ref, safe='')}",
+                etag=known["etag"] if known else None,
+                accept="application/vnd.github.sha",
+                timeout=timeout
+            )
+        except RateLimitError:
+            status, body, etag = 0, "", None
+        if status == 304 and known:
+            entry = known
+        elif status == 200 and _SHA_RE.fullmatch(body.strip()):
+            entry = {"sha": body.strip(), "etag": etag}
         else:
-            branch = "main"
+            # Offline, rate limited or unknown ref: a stale mapping beats none
+            return ref, known["sha"] if known else None
 
-    url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
-    data = _fetch_api(url)
-    
-    if data:
-        save_cache(cache_key, data)
-        return data
-    return None
+        save_cache(cache_key, entry)
+        return ref, entry["sha"]
+
+def fetch_tree_recursively(owner: str, repo: str, branch: str = None):
+    ref, sha = resolve_ref(owner, repo, branch)
+    # Trees are cached by commit, so they never go stale
+    cache_key = f"{owner}_{repo}_{sha or ref}_tree"
+
+    def fetch():
+        url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{sha or ref}?recursive=1"
+        return _fetch_api(url)
+
+    return single_flight(cache_key, fetch, COMMIT_CACHE_DURATION if sha else CACHE_DURATION) or None
+
+def list_owner_repos(owner: str, kind: str = "org") -> List[Dict]:
+    """
+    Pages through the repositories of an organization (kind="org") or a
+    user (kind="user"; public repositories only). The listing is cached,
+    and each repo's default branch is remembered so later ref resolution
+    needs no extra request. Returns [] if any page fails, so a partial
+    listing is never cached as complete.
+    """
+    if kind not in ("org", "user"):
+        raise ValueError(f"Unknown owner kind: {kind}")
+    base = f"https://api.github.com/{'orgs' if kind == 'org' else 'users'}/{owner}/repos"
+
+    def fetch():
+        repos = []
+        page = 1
+        while True:
+            data = _fetch_api(f"{base}?per_page=100&page={page}")
+            if data is None:
+                print_warning(f"Could not list the repositories of {owner} (page {page} failed).")
+                return None
+            if not data:
+                break
+            repos.extend(
+                {"name": r["name"], "default_branch": r.get("default_branch"), "size": r.get("size", 0), "archived": r.get("archived", False)}
+                for r in data
+            )
+            if len(data) < 100:
+                break
+            page += 1
+        return repos
+
+    repos = single_flight(f"{owner}_{kind}_repos", fetch) or []
+    for r in repos:
+        key = f"{owner}_{r['name']}_default_branch"
+        if r["default_branch"] and not load_cache(key, DEFAULT_BRANCH_DURATION):
+            save_cache(key, r["default_branch"])
+    return repos
+
+def fetch_path_index(owner: str, repo: str, branch: str = None):
+    """Returns a memory-mapped path index of the repo tree, building it on a miss."""
+    ensure_dirs()
+    ref, sha = resolve_ref(owner, repo, branch)
+    index_key = f"{owner}_{repo}_{sha or ref}_tree.idx"
+    index_name = cache_name(index_key)
+    index_file = CACHE_DIR / index_name
+    max_age = COMMIT_CACHE_DURATION if sha else CACHE_DURATION
+
+    index = open_index(index_file, max_age)
+    if index: return index
+    if SHARED_CACHE_DIR:
+        index = open_index(SHARED_CACHE_DIR / index_name)
+        if index: return index
+
+    with cache_lock(index_key):
+        index = open_index(index_file, max_age)
+        if index: return index
+
+        data = fetch_tree_recursively(owner, repo, sha or ref)
+        if not data or "tree" not in data:
+            return None
+
+        build_index(data["tree"], index_file, truncated=data.get("truncated", False))
+    return open_index(index_file)
+
+def _list_tree_folder(tree: List[Dict], path: str) -> List[Dict]:
+    """Picks the direct children of `path` out of a recursive tree, shaped like the contents API."""
+    prefix = f"{path}/" if path else ""
+    kinds = {"tree": "dir", "blob": "file", "commit": "submodule"}
+    items = []
+    for item in tree:
+        item_path = item["path"]
+        if not item_path.startswith(prefix) or "/" in item_path[len(prefix):]:
+            continue
+        items.append({
+            "name": item_path[len(prefix):],
+            "path": item_path,
+            "type": kinds.get(item["type"], "file"),
+            "size": item.get("size", 0),
+            "sha": item.get("sha"),
+        })
+    return items
 
 def fetch_folder_contents(url: str):
+    """
+    Lists a folder using the recursive tree (usually already cached by
+    find/download), so browsing folders of one repo costs no extra requests.
+    Listings are cached per ref and path.
+    """
     parsed = urlparse(url)
     parts = parsed.path.strip("/").split("/")
     
     # Check for branch in URL: github.com/user/repo/tree/BRANCH/path
-    if len(parts) < 4 or parts[2] != "tree":
+    if len(parts) >= 4 and parts[2] == "tree":
+        owner, repo, branch = parts[0], parts[1], parts[3]
+        path = "/".join(parts[4:]).strip("/")
+    elif len(parts) == 2:
         # Root
-        if len(parts) == 2:
-             return _fetch_api(f"https://api.github.com/repos/{parts[0]}/{parts[1]}/contents")
+        owner, repo, branch, path = parts[0], parts[1], None, ""
+    else:
         return None
-    
-    owner, repo, branch = parts[0], parts[1], parts[3]
-    path = "/".join(parts[4:])
-    
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}?ref={branch}"
-    return _fetch_api(api_url)
 
-def _fetch_api(url):
+    ref, sha = resolve_ref(owner, repo, branch)
+    path_key = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+    cache_key = f"{owner}_{repo}_{sha or ref}_ls_{path_key}"
+
+    def fetch():
+        data = fetch_tree_recursively(owner, repo, sha or ref)
+        if data and "tree" in data and not data.get("truncated"):
+            return _list_tree_folder(data["tree"], path)
+
+        # Tree unavailable or too large to be listed in one response
+        api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}?ref={sha or ref}"
+        return _fetch_api(api_url)
+
+    return single_flight(cache_key, fetch, COMMIT_CACHE_DURATION if sha else CACHE_DURATION) or None
+
+def _conditional_get(url: str, etag: Optional[str] = None, accept: Optional[str] = None, timeout: Optional[float] = None):
+    """
+    GET with If-None-Match. Returns (status, text, etag); status is 0 on
+    network errors and the text is empty for 304s.
+    """
+    headers = get_auth_headers()
+    if accept:
+        headers["Accept"] = accept
+    if etag:
+        headers["If-None-Match"] = etag
+    try:
+        resp = requests.get(url, headers=headers, timeout=timeout)
+    except requests.RequestException:
+        return 0, "", etag
+    _note_rate_limit(resp)
+
+    if resp.status_code == 403 and resp.headers.get("X-RateLimit-Remaining") == "0":
+        raise RateLimitError("GitHub API Rate Limit Exceeded.")
+    if resp.status_code == 304:
+        return 304, "", etag
+    return resp.status_code, resp.text, resp.headers.get("ETag")
+
+def _fetch_api(url, timeout: Optional[float] = None):
     try:
         headers = get_auth_headers()
-        resp = requests.get(url, headers=headers)
+        resp = requests.get(url, headers=headers, timeout=timeout)
+        _note_rate_limit(resp)
         
         if resp.status_code == 403:
             # Check rate limit
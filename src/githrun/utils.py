@@ -9,23 +9,92 @@ import platform
 import subprocess
 import importlib.util
 from pathlib import Path
-from typing import Optional, Dict
+from urllib.parse import quote
+from typing import Optional, Dict, Callable, Any
 from contextlib import contextmanager
 from rich.console import Console
 
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
 console = Console()
 
 # Paths
-APP_DIR = Path.home() / ".githrun"
-CACHE_DIR = APP_DIR / "cache"
+APP_DIR = Path(os.environ.get("GITHRUN_HOME") or Path.home() / ".githrun")
+CACHE_DIR = Path(os.environ.get("GITHRUN_CACHE_DIR") or APP_DIR / "cache")
+LOCK_DIR = CACHE_DIR / "locks"
+# Optional read-only cache layer (e.g. baked into a container image).
+# Entries found here never expire; rebuild the layer to refresh it.
+SHARED_CACHE_DIR = Path(os.environ["GITHRUN_SHARED_CACHE_DIR"]) if os.environ.get("GITHRUN_SHARED_CACHE_DIR") else None
 BIN_DIR = APP_DIR / "bin"
+WHEEL_DIR = APP_DIR / "wheels"
+WHEEL_LOCK = APP_DIR / "wheels.lock"
 CONFIG_FILE = APP_DIR / "config.json"
+CONFIG_LOCK = APP_DIR / "config.lock"
 CACHE_DURATION = 600  # 10 minutes
 
 def ensure_dirs():
-    APP_DIR.mkdir(exist_ok=True)
-    CACHE_DIR.mkdir(exist_ok=True)
+    APP_DIR.mkdir(parents=True, exist_ok=True)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    LOCK_DIR.mkdir(exist_ok=True)
     BIN_DIR.mkdir(exist_ok=True)
+    WHEEL_DIR.mkdir(exist_ok=True)
+
+# File Safety (many githrun processes may share one APP_DIR)
+@contextmanager
+def file_lock(path: Path):
+    """Holds an exclusive advisory lock on `path` (created if missing) for the block."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10s; keep waiting
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+@contextmanager
+def atomic_open(path: Path, mode: str = "w", encoding: Optional[str] = None, private: bool = False):
+    """
+    Opens a temp file next to `path` and renames it over `path` on success,
+    so readers only ever see the old or the complete new file.
+    The file gets the usual umask-based permissions unless `private` is set.
+    """
+    # Created by hand rather than with mkstemp (always 0600), so the kernel
+    # applies the umask to the requested mode
+    flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0)
+    while True:
+        tmp_path = Path(path).with_name(f".{Path(path).name}.{os.urandom(4).hex()}.tmp")
+        try:
+            fd = os.open(tmp_path, flags, 0o600 if private else 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 class ConfigManager:
     """Manages persistent configuration (Tokens, Bookmarks)."""
@@ -38,15 +107,26 @@ class ConfigManager:
         try:
             with open(CONFIG_FILE, "r") as f:
                 return json.load(f)
-        except:
+        except (OSError, ValueError):
             return {"api_key": None, "bookmarks": {}}
 
     @staticmethod
     def save(data: Dict):
         ensure_dirs()
-        with open(CONFIG_FILE, "w") as f:
+        # The config holds the API token
+        with atomic_open(CONFIG_FILE, "w", private=True) as f:
             json.dump(data, f, indent=4)
 
+    @staticmethod
+    @contextmanager
+    def edit():
+        """Locks the config for a read-modify-write and saves it on exit."""
+        ensure_dirs()
+        with file_lock(CONFIG_LOCK):
+            config = ConfigManager.load()
+            yield config
+            ConfigManager.save(config)
+
     @staticmethod
     def get_api_key() -> Optional[str]:
         # 1. Check Environment Variable
@@ -61,7 +141,7 @@ class ConfigManager:
                     for line in f:
                         if line.strip().startswith("GITHUB_TOKEN="):
                             return line.split("=", 1)[1].strip().strip('"').strip("'")
-            except:
+            except OSError:
                 pass
 
         # 3. Check Global Config
@@ -70,17 +150,15 @@ class ConfigManager:
 
     @staticmethod
     def set_api_key(key: str):
-        config = ConfigManager.load()
-        config["api_key"] = key
-        ConfigManager.save(config)
+        with ConfigManager.edit() as config:
+            config["api_key"] = key
 
     @staticmethod
     def add_bookmark(name: str, url: str):
-        config = ConfigManager.load()
-        if "bookmarks" not in config:
-            config["bookmarks"] = {}
-        config["bookmarks"][name] = url
-        ConfigManager.save(config)
+        with ConfigManager.edit() as config:
+            if "bookmarks" not in config:
+                config["bookmarks"] = {}
+            config["bookmarks"][name] = url
 
     @staticmethod
     def get_bookmark(name: str) -> Optional[str]:
@@ -92,28 +170,63 @@ class ConfigManager:
         return ConfigManager.load().get("bookmarks", {})
 
 # Cache Logic
-def load_cache(key: str):
-    ensure_dirs()
-    cache_file = CACHE_DIR / f"{key}.json"
+def cache_name(key: str) -> str:
+    """File-name-safe form of a cache key (refs like "feature/x" contain slashes)."""
+    return quote(key, safe="")
+
+def _read_cache_file(cache_file: Path, max_age: Optional[float]):
     if cache_file.exists():
         try:
             with open(cache_file, "r", encoding="utf-8") as f:
                 data = json.load(f)
-            if time.time() - data["timestamp"] < CACHE_DURATION:
+            if max_age is None or time.time() - data["timestamp"] < max_age:
                 return data["content"]
-        except:
+        except (OSError, ValueError, KeyError, TypeError):
             pass
     return None
 
+def load_cache(key: str, max_age: float = CACHE_DURATION, shared: bool = True):
+    ensure_dirs()
+    content = _read_cache_file(CACHE_DIR / f"{cache_name(key)}.json", max_age)
+    if content is None and shared and SHARED_CACHE_DIR:
+        content = _read_cache_file(SHARED_CACHE_DIR / f"{cache_name(key)}.json", None)
+    return content
+
 def save_cache(key: str, content: any):
     ensure_dirs()
-    cache_file = CACHE_DIR / f"{key}.json"
+    cache_file = CACHE_DIR / f"{cache_name(key)}.json"
     try:
-        with open(cache_file, "w", encoding="utf-8") as f:
+        with atomic_open(cache_file, "w", encoding="utf-8") as f:
             json.dump({"timestamp": time.time(), "content": content}, f)
-    except:
+    except OSError:
         pass
 
+@contextmanager
+def cache_lock(key: str):
+    """Serialises work on one cache key across processes."""
+    ensure_dirs()
+    with file_lock(LOCK_DIR / f"{cache_name(key)}.lock"):
+        yield
+
+def single_flight(key: str, fetch: Callable[[], Any], max_age: float = CACHE_DURATION):
+    """
+    Returns the cached value for `key`, calling `fetch` on a miss.
+    Concurrent processes missing the same key wait for the first one's
+    fetch instead of all hitting the network.
+    """
+    cached = load_cache(key, max_age)
+    if cached: return cached
+
+    with cache_lock(key):
+        # Another process may have filled the cache while we waited
+        cached = load_cache(key, max_age)
+        if cached: return cached
+
+        content = fetch()
+        if content:
+            save_cache(key, content)
+        return content
+
 # Dependency & Venv Logic
 def check_package_installed(package_name: str) -> bool:
     if package_name in sys.builtin_module_names:
@@ -142,17 +255,47 @@ class VenvManager:
             return self.venv_dir / "Scripts" / "pip.exe"
         return self.venv_dir / "bin" / "pip"
 
-    def create(self):
-        """Creates the virtual environment."""
+    def create(self, timeout: Optional[float] = None):
+        """Creates the virtual environment, giving up after `timeout` seconds."""
         console.print("[blue]Creating temporary virtual environment...[/blue]")
-        venv.create(self.venv_dir, with_pip=True)
+        if timeout is None:
+            venv.create(self.venv_dir, with_pip=True)
+        else:
+            # Out of process so a stuck pip bootstrap can be killed
+            subprocess.run([sys.executable, "-m", "venv", str(self.venv_dir)], check=True, timeout=max(timeout, 0))
 
-    def install(self, packages: list):
-        """Installs packages into the venv."""
+    def install(self, packages: list, timeout: Optional[float] = None):
+        """
+        Installs packages into the venv from the local wheelhouse (WHEEL_DIR).
+        If anything is missing there, wheels for the packages and their
+        dependencies are downloaded/built into the wheelhouse first, so later
+        runs (including offline ones) install without touching the index.
+        `timeout` bounds the whole step; subprocess.TimeoutExpired is raised when it runs out.
+        """
         if not packages:
             return
         console.print(f"[blue]Installing dependencies: {', '.join(packages)}...[/blue]")
-        subprocess.check_call([str(self.pip_exe), "install"] + packages, stdout=subprocess.DEVNULL)
+        ensure_dirs()
+        pip = str(self.pip_exe)
+        from_wheelhouse = [pip, "install", "--no-index", "--find-links", str(WHEEL_DIR)] + packages
+        deadline = time.time() + timeout if timeout is not None else None
+
+        def remaining():
+            return max(deadline - time.time(), 0) if deadline else None
+
+        if subprocess.call(from_wheelhouse, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=remaining()) == 0:
+            return
+
+        with file_lock(WHEEL_LOCK):
+            built = subprocess.call(
+                [pip, "wheel", "--wheel-dir", str(WHEEL_DIR), "--find-links", str(WHEEL_DIR)] + packages,
+                stdout=subprocess.DEVNULL, timeout=remaining()
+            )
+        if built == 0:
+            subprocess.check_call(from_wheelhouse, stdout=subprocess.DEVNULL, timeout=remaining())
+        else:
+            # Could not populate the wheelhouse; install directly as before
+            subprocess.check_call([pip, "install"] + packages, stdout=subprocess.DEVNULL, timeout=remaining())
 
     def cleanup(self):
         """Deletes the virtual environment."""
@@ -1,7 +1,13 @@
 import os
 import sys
+import json
 import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
 import githrun
+from githrun import network
+from githrun.index import build_index, open_index
 from rich.console import Console
 from rich.panel import Panel
 
@@ -69,6 +75,124 @@ def test_python_api():
     except Exception as e:
         console.print(f"[bold red]✘ Error:[/bold red] {e}")
 
+def test_graphql_batching():
+    """Runs fetch_files against a local GraphQL stub (no GitHub access needed)."""
+    print_header("Testing Batched GraphQL Fetching (Local Stub)")
+    queries = []
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            queries.append(body)
+            repository = {}
+            for key, expression in body["variables"].items():
+                if key.startswith("e"):
+                    path = expression.split(":", 1)[1]
+                    repository["f" + key[1:]] = None if "missing" in path else {
+                        "text": f"# {path}", "isBinary": False, "isTruncated": False
+                    }
+            payload = json.dumps({"data": {"repository": repository}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    raw_fetches = []
+    saved = (network.GRAPHQL_URL, network.fetch_url_bytes, os.environ.get("GITHUB_TOKEN"))
+    network.GRAPHQL_URL = f"http://127.0.0.1:{server.server_port}"
+    network.fetch_url_bytes = lambda url: raw_fetches.append(url) or b"raw"
+    os.environ["GITHUB_TOKEN"] = "stub-token"  # GraphQL is only used when logged in
+    try:
+        paths = [f"src/f{i}.py" for i in range(120)] + ["src/missing.py", "src/big.bin"]
+        sizes = {"src/big.bin": network.GRAPHQL_MAX_BLOB_SIZE + 1}
+        contents = network.fetch_files("owner", "repo", "0" * 40, paths, sizes)
+    finally:
+        server.shutdown()
+        network.GRAPHQL_URL, network.fetch_url_bytes, token = saved
+        if token is None:
+            os.environ.pop("GITHUB_TOKEN", None)
+        else:
+            os.environ["GITHUB_TOKEN"] = token
+
+    batch_sizes = [sum(1 for k in q["variables"] if k.startswith("e")) for q in queries]
+    checks = [
+        ("Chunked into 50/50/21", batch_sizes == [50, 50, 21]),
+        ("Text blobs served from GraphQL", contents["src/f7.py"] == b"# src/f7.py"),
+        ("Missing blob fell back to raw", contents["src/missing.py"] == b"raw"),
+        ("Oversized blob skipped GraphQL", contents["src/big.bin"] == b"raw"),
+        ("Exactly two raw fetches", sorted(u.rsplit("/", 1)[1] for u in raw_fetches) == ["big.bin", "missing.py"]),
+    ]
+    for label, ok in checks:
+        if ok:
+            console.print(f"[green]✔ Success: {label}[/green]")
+        else:
+            console.print(f"[bold red]✘ Failed: {label}[/bold red]")
+    assert all(ok for _, ok in checks)
+
+def test_path_index():
+    """Builds and queries a path index in a temp dir (no GitHub access needed)."""
+    print_header("Testing Path Index Search (Local)")
+    tree = [
+        {"path": "README.md", "type": "blob", "sha": "ab" * 20},
+        {"path": "src", "type": "tree", "sha": "cd" * 20},
+        {"path": "src/main.py", "type": "blob", "sha": "ef" * 20},
+        {"path": "src/utils/helpers.py", "type": "blob", "sha": "01" * 20},
+        {"path": "test/test_main.py", "type": "blob", "sha": "23" * 20},
+        {"path": "docs/Setup.rst", "type": "blob"},
+    ]
+    tmp = tempfile.mkdtemp(prefix="githrun_index_")
+    try:
+        build_index(tree, os.path.join(tmp, "repo.idx"), truncated=True)
+        build_index([], os.path.join(tmp, "empty.idx"))
+        index = open_index(os.path.join(tmp, "repo.idx"))
+        empty = open_index(os.path.join(tmp, "empty.idx"))
+
+        def paths(hits):
+            return [index.path(i) for i in hits]
+
+        checks = [
+            ("Round-trip keeps entries and flags", len(index) == 6 and index.truncated and not empty.truncated
+                and index.entry(2) == ("src/main.py", "blob", "ef" * 20) and index.type(1) == "tree"),
+            ("Missing sha stored as zeros", index.sha(5) == "0" * 40),
+            ("Substring is case-insensitive", paths(index.search("SETUP")) == ["docs/Setup.rst"]),
+            ("Substring honours limit", paths(index.search("main", limit=1)) == ["src/main.py"]),
+            ("'*.py' matches file names at any depth", paths(index.glob("*.py")) == ["src/main.py", "src/utils/helpers.py", "test/test_main.py"]),
+            ("'*' matches every entry once", index.glob("*") == list(range(6))),
+            ("'**' matches every entry once", index.glob("**") == list(range(6))),
+            ("'*' in a path stays in one segment", paths(index.glob("src/*.py")) == ["src/main.py"]),
+            ("'**/' spans segments", paths(index.glob("src/**/*.py")) == ["src/main.py", "src/utils/helpers.py"]),
+            ("Bracket classes", paths(index.glob("[rs]*")) == ["README.md", "src", "docs/Setup.rst"]),
+            ("Negated bracket classes", paths(index.glob("[!rst]*")) == ["src/main.py", "src/utils/helpers.py"]),
+            ("Glob honours limit", len(index.glob("*", limit=2)) == 2),
+            ("Fuzzy ranks exact name first", paths(index.fuzzy("main"))[:1] == ["src/main.py"]),
+            ("Fuzzy matches subsequences", paths(index.fuzzy("hlp")) == ["src/utils/helpers.py"]),
+            ("Fuzzy honours limit", len(index.fuzzy("m", limit=2)) == 2),
+            ("Empty index returns nothing", empty.glob("*") == [] and empty.glob("**") == []
+                and empty.search("a") == [] and empty.fuzzy("a") == []),
+        ]
+        try:
+            index.glob("[")
+            checks.append(("Unclosed '[' is literal", True))
+        except ValueError:
+            checks.append(("Unclosed '[' is literal", False))
+        index.close()
+        empty.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    for label, ok in checks:
+        if ok:
+            console.print(f"[green]✔ Success: {label}[/green]")
+        else:
+            console.print(f"[bold red]✘ Failed: {label}[/bold red]")
+    assert all(ok for _, ok in checks)
+
 def main():
     # Ensure we are in the right directory or package is installed
     if not shutil.which("githrun"):
@@ -97,6 +221,8 @@ def main():
     # 5. Find File (Non-interactive)
     # Typer converts `interactive=True` to a flag `--no-interactive`
     test_cli_command(f"githrun find {TEST_REPO} test --no-interactive", "Find File")
+    test_cli_command(f"githrun find {TEST_REPO} \"*.py\" --glob --no-interactive", "Find File (Glob)")
+    test_cli_command(f"githrun find {TEST_REPO} tst --fuzzy --limit 3 --no-interactive", "Find File (Fuzzy)")
 
     # 6. Download
     test_cli_command(f"githrun download {TEST_FILE} -o {DOWNLOAD_TARGET}", "Download File")
@@ -111,6 +237,8 @@ def main():
 
     # --- API TESTS ---
     test_python_api()
+    test_graphql_batching()
+    test_path_index()
 
     print_header("Test Suite Completed")
 